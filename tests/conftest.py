@@ -0,0 +1,6 @@
+import os
+import sys
+
+# main.py создает Bot при импорте, а aiogram проверяет формат токена
+os.environ.setdefault("API_TOKEN", "123456:TEST-TOKEN")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,246 @@
+"""
+Одинаковые проверки для всех реализаций Storage.
+
+PostgreSQL проверяется, только если задан TEST_POSTGRES_DSN и установлен
+asyncpg; каждый тест работает в своей временной схеме.
+"""
+import asyncio
+import os
+import sqlite3
+import uuid
+from contextlib import closing
+
+import pytest
+from aiogram.fsm.storage.base import StorageKey
+
+import main
+
+POSTGRES_DSN = os.getenv("TEST_POSTGRES_DSN")
+
+
+class SqliteBackend:
+    # Состояние FSM, кулдауны и антифлуд у SQLite свои в каждом процессе
+    shared = False
+
+    def __init__(self, tmp_path):
+        self.path = str(tmp_path / "storage.db")
+
+    def create(self) -> main.Storage:
+        return main.SqliteStorage(self.path)
+
+    async def audit_rows(self) -> list[tuple]:
+        with closing(sqlite3.connect(self.path)) as conn:
+            return conn.execute("SELECT user_id, event, details FROM audit_log ORDER BY id").fetchall()
+
+    async def cleanup(self):
+        pass
+
+
+class PostgresBackend:
+    shared = True
+
+    def __init__(self):
+        self.schema = f"test_{uuid.uuid4().hex[:8]}"
+
+    def create(self) -> main.Storage:
+        return main.PostgresStorage(POSTGRES_DSN, schema=self.schema)
+
+    async def audit_rows(self) -> list[tuple]:
+        conn = await main.asyncpg.connect(POSTGRES_DSN, server_settings={"search_path": self.schema})
+        try:
+            rows = await conn.fetch("SELECT user_id, event, details FROM audit_log ORDER BY id")
+        finally:
+            await conn.close()
+        return [tuple(row) for row in rows]
+
+    async def cleanup(self):
+        conn = await main.asyncpg.connect(POSTGRES_DSN)
+        try:
+            await conn.execute(f'DROP SCHEMA IF EXISTS "{self.schema}" CASCADE')
+        finally:
+            await conn.close()
+
+
+@pytest.fixture(params=["sqlite", "postgres"])
+def backend(request, tmp_path):
+    if request.param == "sqlite":
+        backend = SqliteBackend(tmp_path)
+    else:
+        if not POSTGRES_DSN:
+            pytest.skip("TEST_POSTGRES_DSN не задан")
+        if main.asyncpg is None:
+            pytest.skip("asyncpg не установлен")
+        backend = PostgresBackend()
+    yield backend
+    asyncio.run(backend.cleanup())
+
+
+def run_with_store(backend, scenario):
+    async def run():
+        store = backend.create()
+        await store.connect()
+        try:
+            await scenario(store)
+        finally:
+            await store.close()
+
+    asyncio.run(run())
+
+
+def test_users(backend):
+    async def scenario(store):
+        await store.add_user(1, "first")
+        await store.add_user(1, "again")
+        await store.add_user(2, None)
+        assert sorted(await store.list_user_ids()) == [1, 2]
+
+    run_with_store(backend, scenario)
+
+
+def test_messages(backend):
+    async def scenario(store):
+        first = await store.add_message(10, "author", "Первое сообщение", "2024-01-01 10:00:00")
+        second, third = await asyncio.gather(
+            store.add_message(11, "other", "Второе", "2024-01-01 10:00:01"),
+            store.add_message(12, "third", "Третье", "2024-01-01 10:00:02"),
+        )
+        assert len({first, second, third}) == 3
+        assert first < min(second, third)
+        assert await store.get_message(first) == (10, "author", "Первое сообщение", "2024-01-01 10:00:00")
+        assert await store.get_message(max(second, third) + 1000) is None
+
+    run_with_store(backend, scenario)
+
+
+def test_bans(backend):
+    async def scenario(store):
+        assert await store.get_ban(20) is None
+        await store.save_bans([(20, "2030-01-01T00:00:00", "Отправка ссылок.")])
+        assert await store.get_ban(20) == ("2030-01-01T00:00:00", "Отправка ссылок.")
+        # Повторный бан заменяет срок и причину
+        await store.save_bans([(20, main.PERMANENT_BAN_DATE, "Навсегда")])
+        assert await store.get_ban(20) == (main.PERMANENT_BAN_DATE, "Навсегда")
+        await store.save_bans([(user_id, "2030-01-01T00:00:00", "Массовый бан") for user_id in range(100, 600)])
+        assert await store.get_ban(599) == ("2030-01-01T00:00:00", "Массовый бан")
+        await store.delete_bans([20, 100, 999999])
+        assert await store.get_ban(20) is None
+        assert await store.get_ban(100) is None
+        assert await store.get_ban(101) is not None
+
+    run_with_store(backend, scenario)
+
+
+def test_payments(backend):
+    async def scenario(store):
+        assert not await store.has_completed_payment(30, 1)
+        await store.add_payment("pending-1", 30, 1, "2024-01-01 10:00:00", "pending")
+        assert not await store.has_completed_payment(30, 1)
+        await store.add_payment("charge-1", 30, 1, "2024-01-01 10:00:00", "completed")
+        assert await store.has_completed_payment(30, 1)
+        assert not await store.has_completed_payment(31, 1)
+        # Повторный payment_id отклоняется
+        with pytest.raises(Exception):
+            await store.add_payment("charge-1", 30, 1, "2024-01-01 10:00:00", "completed")
+
+    run_with_store(backend, scenario)
+
+
+def test_audit_is_written(backend):
+    async def scenario(store):
+        store.audit("test_event", 1, "проверка")
+        store.audit("test_event", None, "")
+
+    # close() дожидается фоновых записей журнала
+    run_with_store(backend, scenario)
+    assert asyncio.run(backend.audit_rows()) == [(1, "test_event", "проверка"), (None, "test_event", "")]
+
+
+def test_expire_bans(backend):
+    async def scenario(store):
+        await store.save_bans([(40, "2024-01-01T00:00:00", "Старый"), (41, "2024-01-01T00:00:00", "Старый")])
+        # Бан 41 продлили после запуска таймера: его таймер ничего не снимает
+        await store.save_bans([(41, "2030-01-01T00:00:00", "Новый")])
+        expired = await store.expire_bans([(40, "2024-01-01T00:00:00"), (41, "2024-01-01T00:00:00")])
+        assert expired == [40]
+        assert await store.get_ban(41) == ("2030-01-01T00:00:00", "Новый")
+        # Повторный разбан (например, с другой копии бота) ничего не возвращает
+        assert await store.expire_bans([(40, "2024-01-01T00:00:00")]) == []
+
+    run_with_store(backend, scenario)
+
+
+def test_cooldown(backend):
+    async def scenario(store):
+        assert await store.claim_cooldown(50, 3600) == 0
+        wait_time = await store.claim_cooldown(50, 3600)
+        assert 0 < wait_time <= 3600
+        assert await store.claim_cooldown(51, 3600) == 0
+        # Истекший кулдаун снова пропускает сообщение
+        assert await store.claim_cooldown(50, 0) == 0
+
+    run_with_store(backend, scenario)
+
+
+def test_flood(backend, monkeypatch):
+    monkeypatch.setattr(main, "FLOOD_RATE", 0.0)
+    monkeypatch.setattr(main, "FLOOD_STRIKES_TO_BAN", 3)
+
+    async def scenario(store):
+        verdicts = [await store.take_flood_token(60) for _ in range(main.FLOOD_BURST + 4)]
+        assert verdicts == [main.FLOOD_ALLOWED] * main.FLOOD_BURST + [
+            main.FLOOD_DROPPED, main.FLOOD_DROPPED, main.FLOOD_BANNED_NOW, main.FLOOD_BANNED,
+        ]
+        assert await store.take_flood_token(61) == main.FLOOD_ALLOWED
+
+    run_with_store(backend, scenario)
+
+
+def test_fsm_storage(backend):
+    async def scenario(store):
+        fsm = store.fsm_storage()
+        key = StorageKey(bot_id=1, chat_id=70, user_id=70)
+        assert await fsm.get_state(key) is None
+        assert await fsm.get_data(key) == {}
+        await fsm.set_state(key, main.Form.admin_bulk_resolving)
+        await fsm.set_data(key, {"bulk_targets": [(1, "имя")], "ban_duration_days": 3})
+        await fsm.update_data(key, {"target_user_id": 5})
+        assert await fsm.get_state(key) == main.Form.admin_bulk_resolving.state
+        data = await fsm.get_data(key)
+        assert data["ban_duration_days"] == 3 and data["target_user_id"] == 5
+        assert [tuple(target) for target in data["bulk_targets"]] == [(1, "имя")]
+        # Другой чат того же пользователя — отдельное состояние
+        assert await fsm.get_state(StorageKey(bot_id=1, chat_id=71, user_id=70)) is None
+        await fsm.set_state(key, None)
+        await fsm.set_data(key, {})
+        assert await fsm.get_state(key) is None
+        assert await fsm.get_data(key) == {}
+
+    run_with_store(backend, scenario)
+
+
+def test_state_is_shared_between_copies(backend):
+    if not backend.shared:
+        pytest.skip("хранилище не разделяет состояние между копиями бота")
+
+    async def run():
+        first, second = backend.create(), backend.create()
+        await first.connect()
+        await second.connect()
+        try:
+            key = StorageKey(bot_id=1, chat_id=80, user_id=80)
+            await first.fsm_storage().set_state(key, main.Form.admin_bulk_resolving)
+            assert await second.fsm_storage().get_state(key) == main.Form.admin_bulk_resolving.state
+
+            results = await asyncio.gather(first.claim_cooldown(80, 3600), second.claim_cooldown(80, 3600))
+            assert sorted(result == 0 for result in results) == [False, True]
+
+            verdicts = await asyncio.gather(*(
+                store.take_flood_token(81) for store in [first, second] * main.FLOOD_BURST
+            ))
+            assert verdicts.count(main.FLOOD_ALLOWED) <= main.FLOOD_BURST + 1
+            assert main.FLOOD_DROPPED in verdicts
+        finally:
+            await first.close()
+            await second.close()
+
+    asyncio.run(run())
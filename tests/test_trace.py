@@ -0,0 +1,73 @@
+import main
+
+SALT = b"trace-test-salt"
+USER_ID = 111111
+SENDER_ID = 222222
+CHANNEL_ID = -1001234567890
+
+
+def collect_ints(obj) -> set[int]:
+    if isinstance(obj, dict):
+        return set().union(*(collect_ints(value) for value in obj.values())) if obj else set()
+    if isinstance(obj, list):
+        return set().union(*(collect_ints(item) for item in obj)) if obj else set()
+    return {obj} if isinstance(obj, int) and not isinstance(obj, bool) else set()
+
+
+def forwarded_update(origin: dict) -> dict:
+    return {
+        "update_id": 1,
+        "message": {
+            "message_id": 10,
+            "date": 1700000000,
+            "chat": {"id": USER_ID, "type": "private", "first_name": "Анна", "username": "anna"},
+            "from": {"id": USER_ID, "is_bot": False, "first_name": "Анна", "username": "anna"},
+            "forward_origin": origin,
+            "text": "Пересланное сообщение 123",
+        },
+    }
+
+
+def test_forwarded_from_user_is_anonymized():
+    update = forwarded_update({
+        "type": "user",
+        "date": 1699999999,
+        "sender_user": {"id": SENDER_ID, "is_bot": False, "first_name": "Иван", "last_name": "Петров", "username": "ivan"},
+    })
+    result = main.anonymize_update(update, SALT)
+
+    sender = result["message"]["forward_origin"]["sender_user"]
+    assert sender["id"] == main.anonymize_id(SENDER_ID, SALT)
+    assert sender["first_name"] == sender["last_name"] == sender["username"] == "anon"
+    assert not {USER_ID, SENDER_ID} & collect_ints(result)
+
+
+def test_forwarded_from_channel_is_anonymized():
+    update = forwarded_update({
+        "type": "channel",
+        "date": 1699999999,
+        "chat": {"id": CHANNEL_ID, "type": "channel", "title": "Канал"},
+        "message_id": 5,
+        "author_signature": "Иван Петров",
+    })
+    result = main.anonymize_update(update, SALT)
+
+    origin = result["message"]["forward_origin"]
+    assert origin["chat"]["id"] == main.anonymize_id(CHANNEL_ID, SALT) < 0
+    assert origin["chat"]["title"] == origin["author_signature"] == "anon"
+    assert CHANNEL_ID not in collect_ints(result)
+
+
+def test_forwarded_from_hidden_user_is_anonymized():
+    update = forwarded_update({"type": "hidden_user", "date": 1699999999, "sender_user_name": "Иван Петров"})
+    result = main.anonymize_update(update, SALT)
+
+    assert result["message"]["forward_origin"]["sender_user_name"] == "anon"
+    assert result["message"]["text"] == "xxxxxxxxxxx xxxxxxxxx 111"
+
+
+def test_pseudonyms_are_stable_and_admins_kept():
+    assert main.anonymize_id(SENDER_ID, SALT) == main.anonymize_id(SENDER_ID, SALT)
+    assert main.anonymize_id(SENDER_ID, SALT) != main.anonymize_id(SENDER_ID, b"other-salt")
+    for admin_id in main.ADMIN_IDS:
+        assert main.anonymize_id(admin_id, SALT) == admin_id
@@ -0,0 +1,70 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+import main
+
+CREATE_SQL = "CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)"
+INSERT_SQL = "INSERT INTO items (name) VALUES (?)"
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "batch.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute(CREATE_SQL)
+    return path
+
+
+def test_failed_row_does_not_roll_back_batch(db_path):
+    async def scenario():
+        writer = main.WriteBatcher(db_path)
+        try:
+            futures = [writer.submit(INSERT_SQL, (name,)) for name in ("a", "b", "a", "c")]
+            return await asyncio.gather(*futures, return_exceptions=True)
+        finally:
+            writer.close()
+
+    results = asyncio.run(scenario())
+    assert isinstance(results[2], sqlite3.IntegrityError)
+    assert all(isinstance(result, int) for i, result in enumerate(results) if i != 2)
+    with sqlite3.connect(db_path) as conn:
+        assert [name for name, in conn.execute("SELECT name FROM items ORDER BY id")] == ["a", "b", "c"]
+
+
+def test_batch_error_fails_futures_and_keeps_thread(db_path, monkeypatch):
+    async def scenario():
+        writer = main.WriteBatcher(db_path, max_delay=0)
+        original_commit = writer._commit
+        calls = 0
+
+        def flaky_commit(conn, batch):
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                raise RuntimeError("сбой пакета")
+            original_commit(conn, batch)
+
+        monkeypatch.setattr(writer, "_commit", flaky_commit)
+        try:
+            with pytest.raises(RuntimeError):
+                await asyncio.wait_for(writer.submit(INSERT_SQL, ("a",)), 5)
+            assert await asyncio.wait_for(writer.submit(INSERT_SQL, ("b",)), 5) > 0
+        finally:
+            writer.close()
+
+    asyncio.run(scenario())
+
+
+def test_pending_writes_fail_when_thread_stops(tmp_path):
+    async def scenario():
+        # Соединение не открывается: каталога не существует
+        writer = main.WriteBatcher(str(tmp_path / "missing" / "batch.db"))
+        writer.thread.join(timeout=5)
+        assert writer.stopped
+        with pytest.raises(RuntimeError):
+            writer.submit(INSERT_SQL, ("a",))
+
+    asyncio.run(scenario())
+